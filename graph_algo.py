@@ -0,0 +1,114 @@
+"""graph_algo.py
+
+Compiled shortest-path kernels for the Routing Simulator app.
+Provides:
+- graph_to_csr(key): map node labels to ints and pack the edges as CSR arrays
+- dijkstra_csr(indptr, indices, weights, src, n): Numba Dijkstra over CSR
+- csr_to_soa(indptr): per-edge source ids, pairing with `indices`/`weights`
+- bellman_ford_soa(src, dst, w, n, source): Numba Bellman-Ford over edge arrays
+- paths_from_prev(dist, prev, src, labels): rebuild label paths from predecessors
+
+The kernels work on plain NumPy arrays indexed by int node ids so the hot
+loops avoid NetworkX's dict-of-dicts lookups and string hashing. Nothing in
+here depends on Streamlit; caching is left to the caller.
+"""
+from __future__ import annotations
+import heapq
+import numpy as np
+from numba import njit
+
+# Explicit signatures make Numba compile eagerly at import instead of on the
+# first call, and with cache=True the machine code is reused across process
+# restarts. Callers must pass int32 id arrays and float64 weights.
+_KERNEL_SIG = 'Tuple((f8[:], i4[:]))(i4[:], i4[:], f8[:], i4, i4)'
+
+
+def graph_to_csr(key: tuple) -> tuple:
+    """Pack a sorted ``(u, v, weight)`` edge tuple into CSR arrays.
+
+    Returns ``(labels, index, indptr, indices, weights)`` where ``labels[i]``
+    is the node label for id ``i`` and ``index`` is the reverse mapping.
+    """
+    labels = sorted({u for u, _, _ in key} | {v for _, v, _ in key})
+    index = {label: i for i, label in enumerate(labels)}
+    n = len(labels)
+    src = np.fromiter((index[u] for u, _, _ in key), dtype=np.int32, count=len(key))
+    indices = np.fromiter((index[v] for _, v, _ in key), dtype=np.int32, count=len(key))
+    weights = np.fromiter((w for _, _, w in key), dtype=np.float64, count=len(key))
+    # `key` is sorted by source label and labels are sorted too, so the edges
+    # are already grouped by source id; only the row offsets are needed.
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return labels, index, indptr, indices, weights
+
+
+@njit(_KERNEL_SIG, cache=True)
+def dijkstra_csr(indptr, indices, weights, src, n):
+    """Single-source Dijkstra with a binary heap; returns ``(dist, prev)``."""
+    dist = np.full(n, np.inf)
+    dist[src] = 0.0
+    prev = np.full(n, -1, np.int32)
+    heap = [(0.0, np.int64(src))]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                prev[v] = u
+                heapq.heappush(heap, (nd, np.int64(v)))
+    return dist, prev
+
+
+def csr_to_soa(indptr) -> np.ndarray:
+    """Expand CSR row offsets into one source id per edge.
+
+    Together with the CSR ``indices`` and ``weights`` arrays this gives the
+    flat structure-of-arrays edge list Bellman-Ford sweeps over.
+    """
+    n = len(indptr) - 1
+    return np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+
+
+@njit(_KERNEL_SIG, cache=True)
+def bellman_ford_soa(src, dst, w, n, source):
+    """Bellman-Ford over flat edge arrays; returns ``(dist, prev)``.
+
+    Stops as soon as a full sweep relaxes no edge, which on typical
+    topologies is far fewer than the worst-case ``n - 1`` sweeps.
+    """
+    dist = np.full(n, np.inf)
+    dist[source] = 0.0
+    prev = np.full(n, -1, np.int32)
+    for _ in range(n - 1):
+        changed = False
+        for k in range(len(src)):
+            nd = dist[src[k]] + w[k]
+            if nd < dist[dst[k]]:
+                dist[dst[k]] = nd
+                prev[dst[k]] = src[k]
+                changed = True
+        if not changed:
+            break
+    return dist, prev
+
+
+def paths_from_prev(dist, prev, src: int, labels: list) -> tuple[dict, dict]:
+    """Convert kernel output to NetworkX-style ``(dist, paths)`` label dicts.
+
+    Nodes are visited in order of distance so every predecessor's path is
+    already built; this relies on the strictly positive link costs the edge
+    form enforces.
+    """
+    dist_map = {}
+    paths = {}
+    for v in np.argsort(dist, kind='stable'):
+        if not np.isfinite(dist[v]):
+            break
+        label = labels[v]
+        dist_map[label] = float(dist[v])
+        paths[label] = [label] if v == src else paths[labels[prev[v]]] + [label]
+    return dist_map, paths
@@ -6,8 +6,17 @@ from pyvis.network import Network
 import streamlit.components.v1 as components
 import tempfile
 import os
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib
+# headless backend: frames are rendered off-screen, possibly while worker
+# threads quantize earlier ones
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import imageio.v2 as imageio
+from matplotlib.collections import LineCollection
+from PIL import Image
+import graph_algo
 import ui
 
 # Set page configuration
@@ -29,8 +38,15 @@ ui.inject_theme(st.session_state.dark_mode)
 if 'G' not in st.session_state:
     st.session_state.G = nx.DiGraph()
 G = st.session_state.G
+# Bumped by every handler that edits G so derived data (edge signature,
+# CSR arrays, routes) is only rebuilt after an actual topology change.
+if 'graph_version' not in st.session_state:
+    st.session_state.graph_version = 0
 
 # --- Functions ---
+def mark_graph_dirty():
+    st.session_state.graph_version += 1
+
 def add_node_ui():
     with st.sidebar.expander("➕ Add Node"):
         # Use a form so the text input and submit are grouped and don't
@@ -46,16 +62,16 @@ def add_node_ui():
                         st.warning("Node already exists.")
                     else:
                         G.add_node(new_node)
+                        mark_graph_dirty()
                         ui.toast(f"Node '{new_node}' added.", kind='success')
 
-def add_edge_ui():
+def add_edge_ui(node_options):
     with st.sidebar.expander("➕ Add Edge"):
         # Group edge inputs into a form to avoid partial reruns while selecting
         # nodes; this improves focus and reliability.
         with st.form(key="form_add_edge", clear_on_submit=True):
-            node_options = list(G.nodes) if len(G.nodes) else [""]
-            node1 = st.selectbox("From", options=node_options, key="edge_from")
-            node2 = st.selectbox("To", options=node_options, key="edge_to")
+            node1 = st.selectbox("From", options=node_options or [""], key="edge_from")
+            node2 = st.selectbox("To", options=node_options or [""], key="edge_to")
             weight = st.number_input("Weight", min_value=1, step=1, value=1, key='edge_weight')
             add_reverse = st.checkbox("Add reverse edge", value=False, key='edge_reverse')
             submitted = st.form_submit_button("Add Edge")
@@ -71,35 +87,37 @@ def add_edge_ui():
                         G.add_edge(node1, node2, weight=weight)
                         if add_reverse and not G.has_edge(node2, node1):
                             G.add_edge(node2, node1, weight=weight)
+                        mark_graph_dirty()
                         ui.toast(f"Edge {node1} → {node2} added.", kind='success')
                 else:
                     st.error("One or both nodes do not exist.")
 
-def remove_node_ui():
+def remove_node_ui(node_options):
     with st.sidebar.expander("🗑️ Remove Node"):
-        if len(G.nodes) == 0:
+        if not node_options:
             st.info("No nodes to remove.")
             return
         with st.form(key="form_remove_node"):
-            del_node = st.selectbox("Select node", options=list(G.nodes), key="delnode")
+            del_node = st.selectbox("Select node", options=node_options, key="delnode")
             confirm = st.checkbox(f"Confirm remove '{del_node}'", key='confirm_remove_node')
             submitted = st.form_submit_button("Remove Node")
             if submitted:
                 if confirm:
                     if del_node in G.nodes:
                         G.remove_node(del_node)
+                        mark_graph_dirty()
                         ui.toast(f"Node '{del_node}' removed.", kind='warn')
                     else:
                         st.error("Selected node no longer exists.")
                 else:
                     st.info("Check the confirm box to remove the node.")
 
-def remove_edge_ui():
+def remove_edge_ui(edge_options):
     with st.sidebar.expander("🗑️ Remove Edge"):
-        if len(G.edges) == 0:
+        if not edge_options:
             st.info("No edges to remove.")
             return
-        edge_list = [f"{u} -> {v}" for u, v in G.edges]
+        edge_list = [f"{u} -> {v}" for u, v in edge_options]
         with st.form(key="form_remove_edge"):
             del_edge = st.selectbox("Select edge", options=edge_list, key="deledge")
             confirm = st.checkbox(f"Confirm remove '{del_edge}'", key='confirm_remove_edge')
@@ -109,6 +127,7 @@ def remove_edge_ui():
                     u, v = del_edge.split(" -> ")
                     if G.has_edge(u, v):
                         G.remove_edge(u, v)
+                        mark_graph_dirty()
                         ui.toast(f"Edge {u} → {v} removed.", kind='warn')
                     else:
                         st.error("Selected edge no longer exists.")
@@ -122,6 +141,7 @@ def load_sample_topology():
             ("A", "B", 2), ("B", "C", 3), ("C", "D", 1),
             ("A", "D", 10), ("B", "D", 2)
         ])
+        mark_graph_dirty()
         st.success("Sample topology loaded.")
         ui.toast("Sample topology loaded", kind='info')
         # trigger a rerun only after the sample is loaded so the UI refreshes
@@ -136,124 +156,274 @@ def load_sample_topology():
             except Exception:
                 pass
 
-def draw_pyvis(G, path=None):
+def format_cost(cost):
+    # costs come back as floats from the routing kernels; print integral
+    # values exactly (":g" would turn 1234567 into 1.23457e+06)
+    cost = float(cost)
+    return f"{cost:.0f}" if cost.is_integer() else str(cost)
+
+def draw_pyvis(nodes, pos, csr, path_edges=frozenset()):
     net = Network(height="550px", width="100%", directed=True, bgcolor="#ffffff")
-    net.barnes_hut()
-    for node in G.nodes:
-        net.add_node(node, label=node, title=node)
-    # build set of edges in path for quick lookup
-    path_edges = set()
-    if path and len(path) > 1:
-        path_edges = set(zip(path, path[1:]))
-
-    for u, v, data in G.edges(data=True):
-        color = "#2ecc71" if (u, v) in path_edges else "#95a5a6"
-        width = 3 if (u, v) in path_edges else 1
-        net.add_edge(u, v, value=data.get('weight', 1), label=str(data.get('weight', '')), color=color, width=width)
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-    net.write_html(temp_file.name)
-    return temp_file.name
-
-def simulate_routing(G, source, destination, protocol):
+    # nodes are pre-placed from the cached layout, so the browser doesn't
+    # have to run a physics simulation to stabilize the graph
+    net.toggle_physics(False)
+    net.set_options('{"physics": {"enabled": false}, "interaction": {"hover": true}}')
+    for node in nodes:
+        x, y = pos[node]
+        net.add_node(node, label=node, title=node, x=float(x) * 800, y=float(-y) * 800, physics=False, fixed=True)
+
+    # walk the edges as int ids straight from the CSR arrays so the path
+    # membership test hashes int pairs rather than tuples of label strings
+    labels, _, indptr, indices, weights = csr
+    for u_id in range(len(labels)):
+        for k in range(indptr[u_id], indptr[u_id + 1]):
+            v_id = int(indices[k])
+            on_path = (u_id, v_id) in path_edges
+            color = "#2ecc71" if on_path else "#95a5a6"
+            width = 3 if on_path else 1
+            w = float(weights[k])
+            net.add_edge(labels[u_id], labels[v_id], value=w, label=format_cost(w), color=color, width=width)
+
+    # render straight to a string; no temp .html file to write, read back and remove
+    return net.generate_html(notebook=False)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def pyvis_html(version, digest, path, _nodes, _pos, _csr, _path_edges):
+    # The HTML only depends on the topology and the highlighted path, so
+    # widget changes that don't touch either reuse it. The underscored
+    # arguments are determined by (version, digest, path), so Streamlit
+    # skips hashing them.
+    return draw_pyvis(_nodes, _pos, _csr, _path_edges)
+
+def _graph_key(G):
+    # hashable signature of the topology, used as the routing cache key
+    return tuple(sorted((u, v, d['weight']) for u, v, d in G.edges(data=True)))
+
+def _graph_snapshot():
+    # node/edge lists, the edge signature and its digest are only rebuilt
+    # after an edit bumped graph_version, not on every rerun
+    state = st.session_state
+    if state.get('snapshot_version') != state.graph_version:
+        state.graph_key = _graph_key(G)
+        state.nodes_list = list(G.nodes)
+        state.edges_list = list(G.edges)
+        # Cached functions take this short digest as their hashed argument
+        # and the full tuples as underscore (unhashed) arguments; hashing the
+        # edge tuple on every call is as slow as the work it guards.
+        state.graph_digest = hashlib.sha1(repr((state.nodes_list, state.graph_key)).encode("utf-8")).hexdigest()
+        state.snapshot_version = state.graph_version
+    return state
+
+def graph_signature():
+    # (graph_version, digest, edge signature)
+    state = _graph_snapshot()
+    return state.graph_version, state.graph_digest, state.graph_key
+
+def graph_lists():
+    state = _graph_snapshot()
+    return state.nodes_list, state.edges_list
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_csr(version, digest, _key):
+    return graph_algo.graph_to_csr(_key)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def layout(version, digest, _nodes, _key):
+    # spring_layout is O(iterations * N^2); compute it once per topology
+    H = nx.DiGraph()
+    H.add_nodes_from(_nodes)
+    H.add_weighted_edges_from(_key)
+    return nx.spring_layout(H, seed=42)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def all_pairs_routes(version, digest, _key, protocol):
+    # One all-pairs pass per (topology, protocol), kept as compact N x N
+    # (dist, prev) arrays. Path lists are only built for the sources a rerun
+    # asks for (see _routes_from), so a cache hit stays cheap to unpickle.
+    labels, _, indptr, indices, weights = build_csr(version, digest, _key)
+    n = len(labels)
     if protocol == "Dijkstra (OSPF)":
-        path = nx.dijkstra_path(G, source=source, target=destination, weight='weight')
-        cost = nx.dijkstra_path_length(G, source=source, target=destination, weight='weight')
+        def solve(s):
+            return graph_algo.dijkstra_csr(indptr, indices, weights, s, n)
     else:
-        path = nx.bellman_ford_path(G, source=source, target=destination, weight='weight')
-        cost = nx.bellman_ford_path_length(G, source=source, target=destination, weight='weight')
-    return path, cost
-
-def generate_routing_table(G, source, protocol):
-    table = []
-    for node in G.nodes:
-        if node != source:
-            try:
-                if protocol == "Dijkstra (OSPF)":
-                    p = nx.dijkstra_path(G, source, node, weight='weight')
-                    dist = nx.dijkstra_path_length(G, source, node, weight='weight')
-                else:
-                    p = nx.bellman_ford_path(G, source, node, weight='weight')
-                    dist = nx.bellman_ford_path_length(G, source, node, weight='weight')
-                next_hop = p[1] if len(p) > 1 else "-"
-                table.append((node, next_hop, float(dist), " ➔ ".join(p)))
-            except:
-                table.append((node, "-", float('inf'), "No path"))
-    df = pd.DataFrame(table, columns=["Destination", "Next Hop", "Cost", "Path"])
-    return df
-
-def generate_gif_from_path(G, path, filename="routing_animation.gif"):
-    frames = []
-    pos = nx.spring_layout(G, seed=42)
-
-    for i in range(1, len(path)+1):
-        fig, ax = plt.subplots(figsize=(6, 4))
-        nx.draw(G, pos, with_labels=True, node_color="skyblue", edge_color="gray", ax=ax)
-
-        sub_path = list(zip(path[:i-1], path[1:i]))
-        nx.draw_networkx_edges(G, pos, edgelist=sub_path, edge_color="red", width=2, ax=ax)
-
-        edge_labels = nx.get_edge_attributes(G, 'weight')
-        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, ax=ax)
-
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        plt.savefig(temp_file.name, bbox_inches="tight")
-        frames.append(imageio.imread(temp_file.name))
-        plt.close()
-
+        # Bellman-Ford sweeps the edges as flat (src, dst, weight) arrays
+        src = graph_algo.csr_to_soa(indptr)
+        def solve(s):
+            return graph_algo.bellman_ford_soa(src, indices, weights, n, s)
+    dist = np.empty((n, n))
+    prev = np.empty((n, n), dtype=np.int32)
+    for s in range(n):
+        dist[s], prev[s] = solve(s)
+    return dist, prev
+
+def _routes_from(routes, csr, source):
+    # (dist, paths) label dicts for one source, built from its row
+    labels, index = csr[0], csr[1]
+    s = index.get(source)
+    if s is None:
+        # isolated nodes never appear in the edge key, so they only reach themselves
+        return {source: 0}, {source: [source]}
+    dist, prev = routes
+    return graph_algo.paths_from_prev(dist[s], prev[s], s, labels)
+
+def simulate_routing(routes, csr, source, destination):
+    # returns (path, cost, path_edges); path_edges holds the path's hops as
+    # (u, v) int ids from the CSR label index, for highlighting in draw_pyvis
+    dist, paths = _routes_from(routes, csr, source)
+    if destination not in paths:
+        raise nx.NetworkXNoPath(f"No path from {source} to {destination}.")
+    path = paths[destination]
+    index = csr[1]
+    path_edges = frozenset((index[u], index[v]) for u, v in zip(path, path[1:]))
+    return path, dist[destination], path_edges
+
+TABLE_COLUMNS = ["Destination", "Next Hop", "Cost", "Path"]
+
+def _table_columns(routes, csr, nodes, source):
+    # one router's table as parallel arrays (column -> array), so the
+    # DataFrame is built column-wise instead of boxing a tuple per row
+    dist, paths = _routes_from(routes, csr, source)
+    dests = np.array([n for n in nodes if n != source], dtype=object)
+    costs = np.fromiter((dist.get(n, np.inf) for n in dests), dtype=np.float64, count=len(dests))
+    next_hops = np.array([paths[n][1] if n in paths and len(paths[n]) > 1 else "-" for n in dests], dtype=object)
+    path_strs = np.array([" ➔ ".join(paths[n]) if n in paths else "No path" for n in dests], dtype=object)
+    return {"Destination": dests, "Next Hop": next_hops, "Cost": costs, "Path": path_strs}
+
+def generate_routing_table(routes, csr, nodes, source):
+    return pd.DataFrame(_table_columns(routes, csr, nodes, source), columns=TABLE_COLUMNS)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def csv_bytes(version, digest, _nodes, _key, protocol):
+    # encoded export of every router's table, reused until the topology or
+    # protocol changes
+    csr = build_csr(version, digest, _key)
+    routes = all_pairs_routes(version, digest, _key, protocol)
+    # concatenate the per-router column arrays once and build a single
+    # DataFrame instead of growing it with pd.concat per router
+    tables = [_table_columns(routes, csr, _nodes, router) for router in _nodes]
+    all_tables = pd.DataFrame({
+        "Router": np.repeat(np.array(_nodes, dtype=object), [len(t["Destination"]) for t in tables]),
+        **{col: np.concatenate([t[col] for t in tables]) for col in TABLE_COLUMNS},
+    })
+    return all_tables.to_csv(index=False).encode("utf-8")
+
+def display_table(df):
+    # convert inf to a printable symbol for display only to avoid Arrow
+    # serialization issues; one vectorized mask instead of a per-row lambda
+    display_df = df.copy()
+    cost = df['Cost'].astype(object)
+    cost[np.isinf(df['Cost'].to_numpy())] = '∞'
+    display_df['Cost'] = cost
+    return display_df
+
+def generate_gif_from_path(G, path, pos, filename="routing_animation.gif"):
+    # Draw the static topology once; frames only update the highlighted
+    # path segments instead of re-running nx.draw for every frame.
+    fig, ax = plt.subplots(figsize=(6, 4))
+    nx.draw(G, pos, with_labels=True, node_color="skyblue", edge_color="gray", ax=ax)
+    edge_labels = nx.get_edge_attributes(G, 'weight')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, ax=ax)
+    highlight = LineCollection([], colors="red", linewidths=2, zorder=1)
+    ax.add_collection(highlight, autolim=False)
+
+    def render(i):
+        highlight.set_segments([(pos[u], pos[v]) for u, v in zip(path[:i-1], path[1:i])])
+        fig.canvas.draw()
+        # copy, since the next draw reuses the canvas buffer
+        return Image.frombuffer("RGBA", fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1).copy()
+
+    def quantize(frame):
+        return frame.quantize(colors=255, dither=Image.Dither.NONE)
+
+    def frames():
+        # Drawing stays on this thread (the figure is shared), while palette
+        # quantization of finished frames runs in worker threads. At most
+        # `workers` frames are in flight, so frames are still yielded one at
+        # a time in order without buffering the whole animation.
+        workers = os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            pending = deque()
+            for i in range(1, len(path)+1):
+                pending.append(ex.submit(quantize, render(i)))
+                if len(pending) >= workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    # Write the GIF with Pillow directly: each frame gets its own adaptive
+    # palette and optimize/disposal keep the file small.
     gif_path = os.path.join(tempfile.gettempdir(), filename)
-    imageio.mimsave(gif_path, frames, duration=0.8)
+    gen = frames()
+    try:
+        first = next(gen)
+        first.save(gif_path, save_all=True, append_images=gen, duration=800, loop=0, optimize=True, disposal=2)
+    finally:
+        plt.close(fig)
     return gif_path
 
-# --- UI Components ---
 # --- UI Components (sidebar first) ---
+# each handler may edit G (bumping graph_version), so fetch the lists per call
 add_node_ui()
-add_edge_ui()
-remove_node_ui()
-remove_edge_ui()
+add_edge_ui(graph_lists()[0])
+remove_node_ui(graph_lists()[0])
+remove_edge_ui(graph_lists()[1])
 load_sample_topology()
 
 # --- Routing Simulation ---
 st.sidebar.header("Routing Settings")
-protocol = st.sidebar.selectbox("Routing Protocol", ["Dijkstra (OSPF)", "Bellman-Ford (RIP)"])
-nodes = list(G.nodes)
+nodes_list = graph_lists()[0]
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("**Quick Tips**")
 st.sidebar.write("- Add nodes and edges on the left.\n- Select source/destination below and run the simulation.\n- Export routing tables or GIFs for reports.")
 
-if len(nodes) < 2:
+if len(nodes_list) < 2:
     st.info("Add at least two nodes to simulate routing.")
     st.stop()
 
-# Use radio buttons for small topologies (more reliably styled) and
-# fall back to selectbox for larger lists to conserve vertical space.
-if len(nodes) <= 10:
-    source = st.sidebar.radio("Source", nodes, index=0)
-    # choose a sensible default index for destination (not the same as source when possible)
-    dest_index = 1 if len(nodes) > 1 else 0
-    destination = st.sidebar.radio("Destination", nodes, index=dest_index)
-else:
-    source = st.sidebar.selectbox("Source", nodes)
-    destination = st.sidebar.selectbox("Destination", nodes)
+# Keep the routing settings in one form so picking a protocol or endpoint
+# doesn't rerun routing and rendering until "Run" is pressed; widgets in a
+# form report their last submitted values on other reruns.
+with st.sidebar.form(key="form_run"):
+    protocol = st.selectbox("Routing Protocol", ["Dijkstra (OSPF)", "Bellman-Ford (RIP)"])
+    # Use radio buttons for small topologies (more reliably styled) and
+    # fall back to selectbox for larger lists to conserve vertical space.
+    if len(nodes_list) <= 10:
+        source = st.radio("Source", nodes_list, index=0)
+        # choose a sensible default index for destination (not the same as source when possible)
+        dest_index = 1 if len(nodes_list) > 1 else 0
+        destination = st.radio("Destination", nodes_list, index=dest_index)
+    else:
+        source = st.selectbox("Source", nodes_list)
+        destination = st.selectbox("Destination", nodes_list)
+    run = st.form_submit_button("▶️ Run Simulation")
+
+if run:
+    st.session_state.routing_submitted = True
+if not st.session_state.get('routing_submitted'):
+    st.info("Choose a protocol, source and destination, then press Run Simulation.")
+    st.stop()
+
+version, digest, graph_key = graph_signature()
+csr = build_csr(version, digest, graph_key)
+routes = all_pairs_routes(version, digest, graph_key, protocol)
+pos = layout(version, digest, nodes_list, graph_key)
 
 col1, col2 = st.columns([2, 1])
 
 with col1:
     st.subheader("Network Topology")
     try:
-        path, cost = simulate_routing(G, source, destination, protocol)
-        html_path = draw_pyvis(G, path)
-        with open(html_path, "r", encoding="utf-8") as f:
-            components.html(f.read(), height=550)
-        os.remove(html_path)
+        path, cost, path_edges = simulate_routing(routes, csr, source, destination)
+        html = pyvis_html(version, digest, tuple(path), nodes_list, pos, csr, path_edges)
+        components.html(html, height=550)
 
         st.success(f"📍 Shortest Path: {' ➔ '.join(path)}")
-        st.info(f"💰 Total Cost: {cost}")
+        st.info(f"💰 Total Cost: {format_cost(cost)}")
 
         # GIF export button
         if st.button("🎞️ Export Path Animation as GIF"):
-            gif_path = generate_gif_from_path(G, path)
+            gif_path = generate_gif_from_path(G, path, pos)
             with open(gif_path, "rb") as f:
                 st.download_button("⬇️ Download Path GIF", f, file_name="routing_path.gif", mime="image/gif")
 
@@ -262,30 +432,19 @@ with col1:
 
 with col2:
     st.subheader(f"📄 Routing Table ({source})")
-    df = generate_routing_table(G, source, protocol)
-    # convert inf to a printable symbol for display only to avoid Arrow serialization issues
-    display_df = df.copy()
-    display_df['Cost'] = display_df['Cost'].apply(lambda x: '∞' if np.isinf(x) else x)
-    st.dataframe(display_df, use_container_width=True)
+    df = generate_routing_table(routes, csr, nodes_list, source)
+    st.dataframe(display_table(df), use_container_width=True)
 
     if st.checkbox("📘 Show forwarding tables for all routers"):
-        for router in G.nodes:
+        for router in nodes_list:
             if len(G[router]) == 0:
                 continue
             st.markdown(f"#### 📑 Router: {router}")
-            table_df = generate_routing_table(G, router, protocol)
-            table_df_display = table_df.copy()
-            table_df_display['Cost'] = table_df_display['Cost'].apply(lambda x: '∞' if np.isinf(x) else x)
-            st.dataframe(table_df_display, use_container_width=True)
+            table_df = generate_routing_table(routes, csr, nodes_list, router)
+            st.dataframe(display_table(table_df), use_container_width=True)
 
     if st.button("📤 Export all routing tables to CSV"):
-        all_tables = pd.DataFrame()
-        for router in G.nodes:
-            df_r = generate_routing_table(G, router, protocol)
-            df_r.insert(0, "Router", router)
-            all_tables = pd.concat([all_tables, df_r], ignore_index=True)
-
-        csv = all_tables.to_csv(index=False).encode("utf-8")
+        csv = csv_bytes(version, digest, nodes_list, graph_key, protocol)
         st.download_button("⬇️ Download CSV", data=csv, file_name="routing_tables.csv", mime="text/csv")
 
 st.markdown("---")